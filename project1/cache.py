@@ -0,0 +1,74 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class SolutionCache:
+    """Solved LP values and status in ``.npz`` files, evicted LRU past max_bytes."""
+
+    def __init__(self, directory: str = ".uta_cache", max_bytes: int = 1 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts: bytes) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(hashlib.sha256(part).digest())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key: str) -> Optional[Tuple[np.ndarray, str]]:
+        path = self.path(key)
+        try:
+            with np.load(path) as entry:
+                solution, status = entry["solution"], str(entry["status"])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # missing, truncated or written by an older format
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return solution, status
+
+    def store(self, key: str, solution: np.ndarray, status: str):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                solution=np.asarray(solution, dtype=np.float64),
+                status=np.array(status),
+            )
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        # other jobs may evict the same files concurrently, so any entry can
+        # disappear between listing, stat and remove
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(reverse=True)
+        total = 0
+        for _, size, path in entries:
+            total += size
+            if total > self.max_bytes:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -1,37 +1,99 @@
-from typing import Dict, List, Tuple
+import argparse
+import json
+from typing import Dict, List, Optional, Tuple
 
-import matplotlib.pyplot as plt
 import numpy as np
-from pulp import LpMaximize, LpProblem, LpStatus, LpVariable
+
+from cache import SolutionCache
 
 
 class UTA:
-    def __init__(self):
-        self.data = self.load_data("Nuclear waste management.csv")
+    # bump whenever solve() builds a different LP, so cached solutions of the
+    # old model are never served for the new one
+    MODEL_VERSION = 1
+    # breakpoints of every criterion's value function, best value first
+    BREAKPOINTS: List[List[str]] = [
+        ["32", "60", "61", "62", "64", "68", "69", "76", "100"],
+        ["03", "06", "40", "44", "45", "49", "54", "93", "100"],
+        ["00", "38", "54", "56", "57", "65", "100"],
+        ["49", "50", "54", "60", "61", "73", "100"],
+    ]
+    # comparing_variants = ((11, 18), (14, 17), (1, 11), (4, 17), (1, 4))
+    # (name, breakpoints of the first variant, of the second, ">" or "=")
+    PREFERENCES: List[Tuple[str, List[str], List[str], str]] = [
+        (
+            "11_greater_than_18",
+            ["v1_61", "v2_54", "v3_38", "v4_49"],
+            ["v1_76", "v2_06", "v3_100", "v4_60"],
+            ">",
+        ),
+        (
+            "14_equal_17",
+            ["v1_69", "v2_49", "v3_56", "v4_61"],
+            ["v1_68", "v2_40", "v3_65", "v4_60"],
+            "=",
+        ),
+        (
+            "1_greater_than_11",
+            ["v1_60", "v2_93", "v3_00", "v4_73"],
+            ["v1_61", "v2_54", "v3_38", "v4_49"],
+            ">",
+        ),
+        (
+            "3_greater_than_5",
+            ["v1_100", "v2_45", "v3_57", "v4_49"],
+            ["v1_62", "v2_40", "v3_56", "v4_50"],
+            ">",
+        ),
+        (
+            "3_greater_than_8",
+            ["v1_100", "v2_45", "v3_57", "v4_49"],
+            ["v1_64", "v2_44", "v3_54", "v4_54"],
+            ">",
+        ),
+    ]
+
+    def __init__(
+        self,
+        filename: str = "Nuclear waste management.csv",
+        cache_dir: str = ".uta_cache",
+    ):
+        self.data = self.load_data(filename)
         self.criterias: List[np.ndarray] = []
         self.min_values: List[int] = []
         self.ranking: Dict = {}
-        self.all_l = []
+        self.values: List[np.ndarray] = []
+        self.cache = SolutionCache(cache_dir)
 
-    def main(self):
+    def main(self, plot: bool = True, output: Optional[str] = None):
         self.create_solver()
         self.rank_data()
         self.print_ranking()
-        self.plot_uts_crit()
+        if plot or output is not None:
+            self.plot_uts_crit(output)
 
 
     @classmethod
     def load_data(cls, filename: str) -> np.ndarray:
         return np.genfromtxt(filename, delimiter=",")[1:, 1:]
 
-    def plot_uts_crit(self):
+    def plot_uts_crit(self, output: Optional[str] = None):
+        import matplotlib
+
+        if output is not None:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
         fig, axes = plt.subplots(2, 2, figsize=(15, 15))
         for i, ax in enumerate(axes.flat):
-            ax.plot([criteria.name.split("_")[1] for criteria in self.all_l[i]],
-                [round(criteria.value()) for criteria in self.all_l[i]],
+            ax.plot(self.BREAKPOINTS[i],
+                [round(value) for value in self.values[i]],
             )
             ax.set_title(f"C {i + 1}")
-        plt.show()
+        if output is not None:
+            fig.savefig(output)
+        else:
+            plt.show()
 
     def print_ranking(self):
         for i, action in enumerate(self.ranking, 1):
@@ -51,136 +113,102 @@ class UTA:
         self.ranking = sorted(self.ranking.items(), key=lambda x: x[1], reverse=True)
 
     def create_solver(self):
-        # comparing_variants = ((11, 18), (14, 17), (1, 11), (4, 17), (1, 4))
-        model = LpProblem(name="nwm", sense=LpMaximize)
-        epsilon = LpVariable(name="eps", lowBound=0, cat="Continuous")
-
-        v1_32 = LpVariable(name="v1_32", lowBound=0, cat="Continuous")
-        v1_60 = LpVariable(name="v1_60", lowBound=0, cat="Continuous")
-        v1_61 = LpVariable(name="v1_61", lowBound=0, cat="Continuous")
-        v1_62 = LpVariable(name="v1_62", lowBound=0, cat="Continuous")
-        v1_64 = LpVariable(name="v1_64", lowBound=0, cat="Continuous")
-        v1_68 = LpVariable(name="v1_68", lowBound=0, cat="Continuous")
-        v1_69 = LpVariable(name="v1_69", lowBound=0, cat="Continuous")
-        v1_76 = LpVariable(name="v1_76", lowBound=0, cat="Continuous")
-        v1_100 = LpVariable(name="v1_100", lowBound=0, cat="Continuous")
-
-        v2_03 = LpVariable(name="v2_03", lowBound=0, cat="Continuous")
-        v2_06 = LpVariable(name="v2_06", lowBound=0, cat="Continuous")
-        v2_40 = LpVariable(name="v2_40", lowBound=0, cat="Continuous")
-        v2_44 = LpVariable(name="v2_44", lowBound=0, cat="Continuous")
-        v2_45 = LpVariable(name="v2_45", lowBound=0, cat="Continuous")
-        v2_49 = LpVariable(name="v2_49", lowBound=0, cat="Continuous")
-        v2_54 = LpVariable(name="v2_54", lowBound=0, cat="Continuous")
-        v2_93 = LpVariable(name="v2_93", lowBound=0, cat="Continuous")
-        v2_100 = LpVariable(name="v2_100", lowBound=0, cat="Continuous")
-
-        v3_00 = LpVariable(name="v3_00", lowBound=0, cat="Continuous")
-        v3_38 = LpVariable(name="v3_38", lowBound=0, cat="Continuous")
-        v3_54 = LpVariable(name="v3_54", lowBound=0, cat="Continuous")
-        v3_56 = LpVariable(name="v3_56", lowBound=0, cat="Continuous")
-        v3_57 = LpVariable(name="v3_57", lowBound=0, cat="Continuous")
-        v3_65 = LpVariable(name="v3_65", lowBound=0, cat="Continuous")
-        v3_100 = LpVariable(name="v3_100", lowBound=0, cat="Continuous")
-
-        v4_49 = LpVariable(name="v4_49", lowBound=0, cat="Continuous")
-        v4_50 = LpVariable(name="v4_50", lowBound=0, cat="Continuous")
-        v4_54 = LpVariable(name="v4_54", lowBound=0, cat="Continuous")
-        v4_60 = LpVariable(name="v4_60", lowBound=0, cat="Continuous")
-        v4_61 = LpVariable(name="v4_61", lowBound=0, cat="Continuous")
-        v4_73 = LpVariable(name="v4_73", lowBound=0, cat="Continuous")
-        v4_100 = LpVariable(name="v4_100", lowBound=0, cat="Continuous")
-
-        all_1: List[LpVariable] = [
-            v1_32,
-            v1_60,
-            v1_61,
-            v1_62,
-            v1_64,
-            v1_68,
-            v1_69,
-            v1_76,
-            v1_100,
-        ]
-        all_2: List[LpVariable] = [
-            v2_03,
-            v2_06,
-            v2_40,
-            v2_44,
-            v2_45,
-            v2_49,
-            v2_54,
-            v2_93,
-            v2_100,
+        key = self.cache.key(
+            str(self.MODEL_VERSION).encode(),
+            self.data.tobytes(),
+            json.dumps([self.BREAKPOINTS, self.PREFERENCES]).encode(),
+        )
+        cached = self.cache.load(key)
+        if cached is None:
+            cached = self.solve()
+            self.cache.store(key, *cached)
+        solution, status = cached
+        print(f"status: {int(solution[0])}, {status}")
+        print(f"objective: {solution[1]}")
+
+        offsets = np.cumsum([0] + [len(c) for c in self.BREAKPOINTS]) + 2
+        self.values = [
+            solution[start:stop] for start, stop in zip(offsets, offsets[1:])
         ]
-        all_3: List[LpVariable] = [v3_00, v3_38, v3_54, v3_56, v3_57, v3_65, v3_100]
-        all_4: List[LpVariable] = [v4_49, v4_50, v4_54, v4_60, v4_61, v4_73, v4_100]
-        self.all_l: List[List[LpVariable]] = [all_1, all_2, all_3, all_4]
 
-        model += (
-            v1_61 + v2_54 + v3_38 + v4_49 >= v1_76 + v2_06 + v3_100 + v4_60 + epsilon,
-            "11_greater_than_18",
-        )
-        model += (
-            v1_69 + v2_49 + v3_56 + v4_61 == v1_68 + v2_40 + v3_65 + v4_60,
-            "14_equal_17",
-        )
-        model += (
-            v1_60 + v2_93 + v3_00 + v4_73 >= v1_61 + v2_54 + v3_38 + v4_49 + epsilon,
-            "1_greater_than_11",
-        )
-        model += (
-            v1_100 + v2_45 + v3_57 + v4_49 >= v1_62 + v2_40 + v3_56 + v4_50 + epsilon,
-            "3_greater_than_5",
-        )
-        model += (
-            v1_100 + v2_45 + v3_57 + v4_49 >= v1_64 + v2_44 + v3_54 + v4_54 + epsilon,
-            "3_greater_than_8",
-        )
+        for c, values in zip(self.BREAKPOINTS, self.values):
+            arr = np.array([])
+            self.min_values.append(int(c[0]))
+            for i in range(1, len(c)):
+                arr = np.concatenate(
+                    (
+                        arr,
+                        np.linspace(
+                            start=values[i-1],
+                            stop=values[i],
+                            num=int(c[i]) - int(c[i-1]),
+                        ),
+                    )
+                )
+            self.criterias.append(arr)
 
-        model += (v1_32 + v2_03 + v3_00 + v4_49 == 1, "normalization_max")
-        model += (v1_100 == 0, "min_1")
-        model += (v2_100 == 0, "min_2")
-        model += (v3_100 == 0, "min_3")
-        model += (v4_100 == 0, "min_4")
+    def solve(self) -> Tuple[np.ndarray, str]:
+        from pulp import LpMaximize, LpProblem, LpStatus, LpVariable
 
-        for c in [all_1, all_2, all_3, all_4]:
+        model = LpProblem(name="nwm", sense=LpMaximize)
+        epsilon = LpVariable(name="eps", lowBound=0, cat="Continuous")
+        all_l: List[List[LpVariable]] = [
+            [
+                LpVariable(
+                    name=f"v{criterion}_{breakpoint}", lowBound=0, cat="Continuous"
+                )
+                for breakpoint in breakpoints
+            ]
+            for criterion, breakpoints in enumerate(self.BREAKPOINTS, 1)
+        ]
+        variables: Dict[str, LpVariable] = {
+            value.name: value for c in all_l for value in c
+        }
+
+        for name, better, worse, relation in self.PREFERENCES:
+            lhs = sum(variables[v] for v in better)
+            rhs = sum(variables[v] for v in worse)
+            if relation == ">":
+                model += (lhs >= rhs + epsilon, name)
+            else:
+                model += (lhs == rhs, name)
+
+        model += (sum(c[0] for c in all_l) == 1, "normalization_max")
+        for criterion, c in enumerate(all_l, 1):
+            model += (c[-1] == 0, f"min_{criterion}")
+
+        for c in all_l:
             for c_id in range(1, len(c)):
                 model += c[c_id - 1] >= c[c_id]
 
-        for c in self.all_l:
+        for c in all_l:
             for value in c:
                 model += value >= 0
 
         model += epsilon
 
         model.solve()
-        print(f"status: {model.status}, {LpStatus[model.status]}")
-        print(f"objective: {model.objective.value()}")
+        solution = np.array(
+            [model.status, epsilon.value()]
+            + [value.value() for c in all_l for value in c],
+            dtype=float,
+        )
+        return solution, LpStatus[model.status]
 
-        # for c in self.all_l:
-        #     for value in c:
-        #         print(value.name, value.value())
 
-        for c in self.all_l:
-            arr = np.array([])
-            self.min_values.append(int(c[0].name.split("_")[1]))
-            for i in range(1, len(c)):
-                arr = np.concatenate(
-                    (
-                        arr,
-                        np.linspace(
-                            start=c[i-1].value(),
-                            stop=c[i].value(),
-                            num=(
-                                int(c[i].name.split("_")[1])
-                                - int(c[i-1].name.split("_")[1])
-                            ),
-                        ),
-                    )
-                )
-            self.criterias.append(arr)
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="UTA ranking of nuclear waste management variants"
+    )
+    parser.add_argument("data", nargs="?", default="Nuclear waste management.csv")
+    parser.add_argument(
+        "-o", "--output", help="save the value functions plot to this file"
+    )
+    parser.add_argument("--no-plot", action="store_true", help="only print the ranking")
+    parser.add_argument("--cache-dir", default=".uta_cache")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    UTA().main()
+    args = parse_args()
+    UTA(args.data, args.cache_dir).main(plot=not args.no_plot, output=args.output)
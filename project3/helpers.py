@@ -1,17 +1,26 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
 import torch
+import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader, Dataset
-from tqdm import tqdm
-from sklearn.metrics import roc_auc_score
+from torch.utils.data import BatchSampler, DataLoader, Dataset
 from functools import partial
 
 
 class NumpyDataset(Dataset):
     def __init__(self, data, targets):
-        self.data = torch.Tensor(data)
-        self.targets = torch.LongTensor(targets.astype(int))
+        # float32/int64 arrays (e.g. cached memmaps) are wrapped without a copy
+        self.data = torch.from_numpy(np.asarray(data, dtype=np.float32))
+        self.targets = torch.from_numpy(np.asarray(targets).astype(np.int64, copy=False))
 
     def __getitem__(self, index):
+        # index may be a whole batch of indices, see CreateSplitDataLoaders
         x = self.data[index]
         y = self.targets[index]
         return x, y
@@ -21,6 +30,8 @@ class NumpyDataset(Dataset):
 
 
 def Regret(x, target):
+    # scores are (N, 1); compare each sample with its own target, not all N
+    x = x[:, 0]
     return torch.mean(
         torch.relu(-(target >= 1).float() * x) + torch.relu((target < 1).float() * x)
     )
@@ -31,15 +42,77 @@ def Accuracy(x, target):
 
 
 def AUC(x, target):
+    from sklearn.metrics import roc_auc_score
+
     return roc_auc_score(target.detach().numpy(), x.detach().numpy()[:, 0])
 
 
+def mobious_transform(X):
+    i, j = np.triu_indices(X.shape[1], k=1)
+    return np.concatenate([X, np.minimum(X[:, i], X[:, j])], axis=1)
+
+
+def LoadDataset(path, criteria_nr, target_map=None, cache_dir=".cache"):
+    with open(path, "rb") as f:
+        content = f.read()
+    params = json.dumps(
+        {"criteria_nr": criteria_nr, "target_map": sorted((target_map or {}).items())}
+    )
+    key = hashlib.sha256(content + params.encode()).hexdigest()[:32]
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        data = np.genfromtxt(path, delimiter=",")
+        X = mobious_transform(data[:, :criteria_nr]).astype(np.float32)
+        y = data[:, criteria_nr].astype(np.int64)
+        if target_map is not None:
+            y = np.vectorize(target_map.__getitem__, otypes=[np.int64])(y)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=cache_dir)
+        try:
+            np.save(os.path.join(tmp, "X.npy"), X)
+            np.save(os.path.join(tmp, "y.npy"), y)
+            # mkdtemp creates the directory 0700; open it up as far as the umask
+            # allows so workers of other users can map the entry too
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp, 0o777 & ~umask)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                # another process populated the same entry first
+                pass
+        finally:
+            # left over only if saving failed or the entry already existed
+            shutil.rmtree(tmp, ignore_errors=True)
+    # copy-on-write maps stay writable for torch.from_numpy but share pages
+    X = np.load(os.path.join(entry, "X.npy"), mmap_mode="c")
+    y = np.load(os.path.join(entry, "y.npy"), mmap_mode="c")
+    return X, y
+
+
 def CreateDataLoader(X, y):
     dataset = NumpyDataset(X, y)
     return DataLoader(dataset, batch_size=len(dataset))
 
 
+def CreateSplitDataLoaders(X, y, test_size=0.2, random_state=None):
+    # both loaders index one dataset over X and y, so memmaps are never copied
+    dataset = NumpyDataset(X, y)
+    indices = np.random.default_rng(random_state).permutation(len(dataset))
+    test_nr = math.ceil(len(dataset) * test_size)
+    return tuple(
+        DataLoader(
+            dataset,
+            sampler=BatchSampler(split.tolist(), batch_size=len(split), drop_last=False),
+            batch_size=None,
+        )
+        for split in (indices[test_nr:], indices[:test_nr])
+    )
+
+
 def Train(model, train_dataloader, test_dataloader, path, lr=0.01, epoch_nr=200):
+    from tqdm import tqdm
+
     optimizer = optim.AdamW(model.parameters(), lr=lr, betas=(0.9, 0.99))
     best_acc = 0.0
     best_auc = 0.0
@@ -83,6 +156,154 @@ def Train(model, train_dataloader, test_dataloader, path, lr=0.01, epoch_nr=200)
     return best_acc, acc_test, best_auc, auc_test
 
 
+class ChoquetEnsemble(nn.Module):
+    """K independent ChoquetConstrained models stacked into batched tensors.
+
+    Member ``k`` uses row ``k`` of ``criteria_weight``, ``interaction_weight``
+    and ``threshold``; ``forward`` returns one column of scores per member.
+    Passing ``seed`` makes the initialisation of every member reproducible.
+    """
+
+    def __init__(
+        self, criteria_nr, members, thresholds=None, min_w=0.0000001, seed=None
+    ):
+        super().__init__()
+        generator = torch.Generator()
+        if seed is None:
+            generator.seed()
+        else:
+            generator.manual_seed(seed)
+        self.criteria_nr = criteria_nr
+        self.members = members
+        pairs = torch.triu_indices(criteria_nr, criteria_nr, offset=1)
+        self.register_buffer("pair_i", pairs[0])
+        self.register_buffer("pair_j", pairs[1])
+        self.register_buffer(
+            "min_w",
+            torch.as_tensor(min_w, dtype=torch.float32).reshape(-1, 1).expand(members, 1).clone(),
+        )
+        self.criteria_weight = nn.Parameter(
+            torch.empty(members, criteria_nr).uniform_(0.1, 1.0, generator=generator)
+        )
+        self.interaction_weight = nn.Parameter(
+            torch.empty(members, pairs.shape[1]).normal_(0.0, 0.1, generator=generator)
+        )
+        if thresholds is None:
+            threshold = torch.empty(members).uniform_(0.1, 0.5, generator=generator)
+        else:
+            threshold = (
+                torch.as_tensor(thresholds, dtype=torch.float32).reshape(-1).expand(members).clone()
+            )
+        self.threshold = nn.Parameter(threshold)
+
+    def w(self):
+        with torch.no_grad():
+            w = self.criteria_weight.data
+            w.copy_(torch.where(w < 0, self.min_w, w))
+        return self.criteria_weight
+
+    def w_interaction(self):
+        with torch.no_grad():
+            w = self.w().data
+            w_ij = self.interaction_weight.data
+            bound = torch.minimum(w[:, self.pair_i], w[:, self.pair_j])
+            w_ij.copy_(torch.maximum(w_ij, -bound))
+        return self.interaction_weight
+
+    def forward(self, x):
+        if len(x.shape) == 3:
+            x = x[:, 0, :]
+        w = self.w()
+        w_ij = self.w_interaction()
+        x_wi = x[:, : self.criteria_nr] @ w.T
+        x_wij = x[:, self.criteria_nr :] @ w_ij.T
+        weight_sum = w.sum(1) + w_ij.sum(1)
+        return (x_wi + x_wij) / weight_sum - self.threshold
+
+
+def EnsembleRegret(x, target):
+    target = target[:, None]
+    return torch.mean(
+        torch.relu(-(target >= 1).float() * x) + torch.relu((target < 1).float() * x),
+        dim=0,
+    )
+
+
+def EnsembleAccuracy(x, target):
+    return (target[:, None] == (x > 0)).float().mean(0).detach().numpy()
+
+
+def TrainEnsemble(model, train_dataloader, test_dataloader, path, lr=0.01, epoch_nr=200):
+    from tqdm import tqdm
+
+    lrs = torch.as_tensor(lr, dtype=torch.float32).reshape(-1).expand(model.members).clone()
+    # AdamW's step is linear in lr, so a unit step rescaled per member gives
+    # every member its own learning rate from a single optimizer.
+    optimizer = optim.AdamW(model.parameters(), lr=1.0, betas=(0.9, 0.99))
+    best_acc = np.zeros(model.members)
+    best_auc = np.zeros(model.members)
+    best_epoch = np.full(model.members, -1)
+    acc_test = np.zeros(model.members)
+    auc_test = np.zeros(model.members)
+    loss_test = np.zeros(model.members)
+    best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+    member_keys = ["criteria_weight", "interaction_weight", "threshold"]
+    for epoch in tqdm(range(epoch_nr)):
+        for _, data in enumerate(train_dataloader, 0):
+            inputs, labels = data
+            optimizer.zero_grad()
+            outputs = model(inputs)
+            loss = EnsembleRegret(outputs, labels)
+            loss.sum().backward()
+            previous = [p.detach().clone() for p in model.parameters()]
+            optimizer.step()
+            with torch.no_grad():
+                for p, p_old in zip(model.parameters(), previous):
+                    scale = lrs.view(-1, *([1] * (p.dim() - 1)))
+                    p.copy_(p_old + scale * (p - p_old))
+            acc = EnsembleAccuracy(outputs, labels)
+
+        improved = np.flatnonzero(acc > best_acc)
+        if len(improved) == 0:
+            continue
+        best_acc[improved] = acc[improved]
+        best_epoch[improved] = epoch
+        for k in improved:
+            best_auc[k] = AUC(outputs[:, k : k + 1], labels)
+        with torch.no_grad():
+            for i, data in enumerate(test_dataloader, 0):
+                inputs, labels_test = data
+                outputs_test = model(inputs)
+            loss_test[improved] = EnsembleRegret(outputs_test, labels_test).numpy()[improved]
+            acc_test[improved] = EnsembleAccuracy(outputs_test, labels_test)[improved]
+            for k in improved:
+                auc_test[k] = AUC(outputs_test[:, k : k + 1], labels_test)
+            state = model.state_dict()
+            index = torch.as_tensor(improved)
+            for key in member_keys:
+                best_state[key][index] = state[key][index]
+
+        torch.save(
+            {
+                "epoch": best_epoch,
+                "model_state_dict": best_state,
+                "last_epoch": epoch,
+                "last_model_state_dict": model.state_dict(),
+                "optimizer_state_dict": optimizer.state_dict(),
+                "lr": lrs,
+                "loss_train": loss.detach(),
+                "loss_test": loss_test,
+                "accuracy_train": best_acc,
+                "accuracy_test": acc_test,
+                "auc_train": best_auc,
+                "auc_test": auc_test,
+            },
+            path,
+        )
+
+    return best_acc, acc_test, best_auc, auc_test
+
+
 class Hook:
     def __init__(self, m, f):
         self.hook = m.register_forward_hook(partial(f, self))
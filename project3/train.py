@@ -0,0 +1,94 @@
+import argparse
+import csv
+from typing import Dict
+
+
+def parse_target_map(value: str) -> Dict[int, int]:
+    return {
+        int(source): int(target)
+        for source, target in (pair.split(":") for pair in value.split(","))
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Train Choquet integral models on a monodata CSV"
+    )
+    parser.add_argument("data")
+    parser.add_argument("--criteria-nr", type=int, required=True)
+    parser.add_argument(
+        "--target-map", type=parse_target_map, help="e.g. 0:0,1:0,2:0,3:1,4:1"
+    )
+    parser.add_argument("--members", type=int, default=1)
+    parser.add_argument("--lr", type=float, nargs="+", default=[0.01])
+    parser.add_argument("--threshold", type=float, nargs="+")
+    parser.add_argument("--min-w", type=float, nargs="+", default=[0.0000001])
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--checkpoint", default="choquet.pt")
+    parser.add_argument("--metrics", help="write per-member metrics to this CSV")
+    parser.add_argument("--cache-dir", default=".cache")
+    args = parser.parse_args()
+    if args.members < 1:
+        parser.error("--members must be at least 1")
+    for name in ("lr", "threshold", "min_w"):
+        values = getattr(args, name)
+        if values is not None and len(values) not in (1, args.members):
+            parser.error(
+                "--%s expects 1 or %d values (one per member), got %d"
+                % (name.replace("_", "-"), args.members, len(values))
+            )
+    return args
+
+
+def main(args: argparse.Namespace):
+    import torch
+
+    from helpers import (
+        ChoquetEnsemble,
+        CreateSplitDataLoaders,
+        LoadDataset,
+        TrainEnsemble,
+    )
+
+    torch.manual_seed(args.seed)
+
+    X, y = LoadDataset(args.data, args.criteria_nr, args.target_map, args.cache_dir)
+    train_dataloader, test_dataloader = CreateSplitDataLoaders(
+        X, y, test_size=args.test_size, random_state=args.seed
+    )
+    model = ChoquetEnsemble(
+        args.criteria_nr,
+        args.members,
+        thresholds=args.threshold,
+        min_w=args.min_w,
+        seed=args.seed,
+    )
+    acc, acc_test, auc, auc_test = TrainEnsemble(
+        model,
+        train_dataloader,
+        test_dataloader,
+        args.checkpoint,
+        lr=args.lr,
+        epoch_nr=args.epochs,
+    )
+    if args.metrics is None:
+        for k in range(args.members):
+            print("Member %d" % k)
+            print("Accuracy train:\t%.2f%%" % (acc[k] * 100.0))
+            print("Accuracy test:\t%.2f%%" % (acc_test[k] * 100.0))
+            print("AUC train: \t%.2f%%" % (auc[k] * 100.0))
+            print("AUC test: \t%.2f%%" % (auc_test[k] * 100.0))
+        return
+    with open(args.metrics, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["member", "accuracy_train", "accuracy_test", "auc_train", "auc_test"]
+        )
+        for k in range(args.members):
+            writer.writerow([k, acc[k], acc_test[k], auc[k], auc_test[k]])
+
+
+if __name__ == "__main__":
+    main(parse_args())
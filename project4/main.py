@@ -1,16 +1,18 @@
-from typing import Dict, List, Tuple
+from __future__ import annotations
 
-from utils import read_csv
+import argparse
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-import pandas as pd
-import numpy as np
-import pulp as pl
-from pulp import LpProblem, LpMaximize, LpMinimize, LpVariable, LpStatus
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def calculate_efficiencies(
     df: pd.DataFrame, super_eff: bool = False
 ) -> Dict[str, float]:
+    from pulp import LpProblem, LpMaximize, LpVariable
+
     i1 = LpVariable("i1", lowBound=0, cat="Continuous")
     i2 = LpVariable("i2", lowBound=0, cat="Continuous")
     i3 = LpVariable("i3", lowBound=0, cat="Continuous")
@@ -55,6 +57,9 @@ def calculate_efficiencies(
 
 
 def calculate_hcu(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
+    from pulp import LpProblem, LpMinimize, LpVariable, LpStatus
+
     airports: List[str] = df.index.tolist()
     lambdas: Dict[str, LpVariable] = {
         airport_name: LpVariable(airport_name, lowBound=0, cat="Continuous")
@@ -105,6 +110,9 @@ def calculate_hcu(df: pd.DataFrame) -> pd.DataFrame:
 def calculate_cross_efficiencies(
     df: pd.DataFrame, efficiencies: Dict[str, float]
 ) -> pd.DataFrame:
+    import pandas as pd
+    from pulp import LpProblem, LpMaximize, LpVariable
+
     airports: List[str] = df.index.tolist()
     i1 = LpVariable("i1", lowBound=0, cat="Continuous")
     i2 = LpVariable("i2", lowBound=0, cat="Continuous")
@@ -175,6 +183,9 @@ def calculate_cross_efficiencies(
 def calculate_dist(
     df: pd.DataFrame, samples: int = 100
 ) -> Tuple[Dict[str, pd.Series], Dict[str, float]]:
+    import numpy as np
+    import pandas as pd
+
     airports: List[str] = df.index.tolist()
     random_weights: pd.DataFrame = pd.DataFrame(
         np.random.rand(samples, 6), columns=["i1", "i2", "i3", "i4", "o1", "o2"]
@@ -200,15 +211,51 @@ def calculate_dist(
     return dist, estimated
 
 
-def main():
-    df_input: pd.DataFrame = read_csv("inputs.csv")
-    df_output: pd.DataFrame = read_csv("outputs.csv")
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="DEA analysis of airports")
+    parser.add_argument("--inputs", default="inputs.csv")
+    parser.add_argument("--outputs", default="outputs.csv")
+    parser.add_argument("--samples", type=int, default=100)
+    parser.add_argument(
+        "--output-dir", help="write the results as CSV files to this directory"
+    )
+    return parser.parse_args()
+
+
+def main(
+    inputs: str = "inputs.csv",
+    outputs: str = "outputs.csv",
+    samples: int = 100,
+    output_dir: Optional[str] = None,
+):
+    import pandas as pd
+
+    from utils import read_csv
+
+    df_input: pd.DataFrame = read_csv(inputs)
+    df_output: pd.DataFrame = read_csv(outputs)
     df: pd.DataFrame = pd.concat([df_input, df_output], axis=1)
     efficiencies: Dict[str, float] = calculate_efficiencies(df)
     super_efficiencies: Dict[str, float] = calculate_efficiencies(df, True)
     hcu_df = calculate_hcu(df)
     cross_efficiencies_df = calculate_cross_efficiencies(df, efficiencies)
-    dist, estimated = calculate_dist(df)
+    dist, estimated = calculate_dist(df, samples)
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        results: Dict[str, pd.DataFrame] = {
+            "efficiencies": pd.Series(efficiencies).to_frame("efficiency"),
+            "super_efficiencies": pd.Series(super_efficiencies).to_frame(
+                "super_efficiency"
+            ),
+            "hcu": hcu_df,
+            "hcu_difference": df.loc[:, "i1":"i4"] - hcu_df,
+            "cross_efficiencies": cross_efficiencies_df,
+            "distribution": pd.DataFrame.from_dict(dist, orient="index"),
+            "estimated": pd.Series(estimated).sort_values().to_frame("estimated"),
+        }
+        for name, result in results.items():
+            result.to_csv(os.path.join(output_dir, f"{name}.csv"), sep=";")
+        return
     print(efficiencies)
     print(super_efficiencies)
     print(hcu_df)
@@ -221,4 +268,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(args.inputs, args.outputs, args.samples, args.output_dir)
@@ -0,0 +1,369 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _criterion_differences(
+    a_values: np.ndarray,
+    b_values: np.ndarray,
+    gain: Sequence[bool],
+    dtype: type = np.float64,
+) -> np.ndarray:
+    """d[j, a, b] - how much b is better than a on criterion j."""
+    a = np.asarray(a_values, dtype=dtype).T
+    b = np.asarray(b_values, dtype=dtype).T
+    d = b[:, None, :] - a[:, :, None]
+    d *= np.where(np.asarray(gain, dtype=bool), 1, -1).astype(dtype)[:, None, None]
+    return d
+
+
+def _thresholds(thresholds: Sequence[float], dtype: type) -> np.ndarray:
+    return np.asarray(thresholds, dtype=dtype)[:, None, None]
+
+
+def marginal_concordance(
+    values: np.ndarray,
+    q: Sequence[float],
+    p: Sequence[float],
+    gain: Sequence[bool],
+    dtype: type = np.float64,
+) -> np.ndarray:
+    """Concordance c_j(a, b) for all criteria at once, shape (criteria, n, n).
+
+    ``values`` is the (n, criteria) performance table, ``q`` and ``p`` are the
+    indifference and preference thresholds and ``gain`` marks gain criteria
+    (the rest are costs).
+    """
+    return _concordance(_criterion_differences(values, values, gain, dtype), q, p)
+
+
+def _concordance(d: np.ndarray, q: Sequence[float], p: Sequence[float]) -> np.ndarray:
+    q, p = _thresholds(q, d.dtype), _thresholds(p, d.dtype)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = p - d
+        c /= p - q
+    np.clip(c, 0.0, 1.0, out=c)
+    # 0 / 0 only happens for p == q and d == p, i.e. d <= q
+    np.copyto(c, 1.0, where=np.isnan(c))
+    return c
+
+
+def concordance(marginal: np.ndarray, weights: Sequence[float]) -> np.ndarray:
+    """Comprehensive concordance C(a, b) as a weighted mean of ``marginal``."""
+    weights = np.asarray(weights, dtype=marginal.dtype)
+    return np.tensordot(weights, marginal, axes=1) / weights.sum()
+
+
+def marginal_discordance(
+    values: np.ndarray,
+    p: Sequence[float],
+    v: Sequence[float],
+    gain: Sequence[bool],
+    dtype: type = np.float64,
+) -> np.ndarray:
+    """Discordance d_j(a, b) for all criteria at once, shape (criteria, n, n)."""
+    return _discordance(_criterion_differences(values, values, gain, dtype), p, v)
+
+
+def _discordance(d: np.ndarray, p: Sequence[float], v: Sequence[float]) -> np.ndarray:
+    p, v = _thresholds(p, d.dtype), _thresholds(v, d.dtype)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discordance = d - p
+        discordance /= v - p
+    np.clip(discordance, 0.0, 1.0, out=discordance)
+    # 0 / 0 only happens for v == p and d == p, i.e. d <= p
+    np.copyto(discordance, 0.0, where=np.isnan(discordance))
+    return discordance
+
+
+def credibility(C: np.ndarray, discordance: np.ndarray) -> np.ndarray:
+    """Credibility S(a, b) from comprehensive concordance and marginal discordance.
+
+    ``C`` may carry leading batch dimensions, e.g. one matrix per weight vector.
+    """
+    C_j = C[..., None, :, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = np.divide(1.0 - discordance, 1.0 - C_j)
+    np.copyto(factor, 1.0, where=discordance <= C_j)
+    return C * factor.prod(axis=-3)
+
+
+def credibility_tiled(
+    values: np.ndarray,
+    q: Sequence[float],
+    p: Sequence[float],
+    v: Sequence[float],
+    gain: Sequence[bool],
+    weights: Sequence[float],
+    path: str,
+    tile: int = 512,
+    workers: Optional[int] = None,
+) -> np.memmap:
+    """Credibility matrix computed tile by tile into a float32 ``.npy`` memmap.
+
+    Only the current (tile x tile) float32 block of every criterion is held in
+    memory per worker, so the full n x n matrices never have to fit in RAM.
+    Tiles are spread over ``workers`` threads (at most 4 by default); numpy
+    releases the GIL for the heavy element-wise work. The matrix is written to
+    ``path``, which the caller owns and deletes.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    n = values.shape[0]
+    if workers is None:
+        workers = min(4, os.cpu_count() or 1)
+    S = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, n))
+
+    def compute(bounds: Tuple[int, int]) -> None:
+        rows = slice(bounds[0], bounds[0] + tile)
+        cols = slice(bounds[1], bounds[1] + tile)
+        d = _criterion_differences(values[rows], values[cols], gain, np.float32)
+        C = concordance(_concordance(d, q, p), weights)
+        S[rows, cols] = credibility(C, _discordance(d, p, v))
+
+    tiles = [(i, j) for i in range(0, n, tile) for j in range(0, n, tile)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(compute, tiles))
+    S.flush()
+    return S
+
+
+def _chunks(indices: np.ndarray, block: int) -> Iterator[np.ndarray]:
+    for start in range(0, len(indices), block):
+        yield indices[start : start + block]
+
+
+def _outranking(
+    s_ab: np.ndarray, s_ba: np.ndarray, lam: float, alpha: float, beta: float
+) -> np.ndarray:
+    return (s_ab > lam) & (s_ab > s_ba + alpha + beta * s_ab)
+
+
+def _relations(
+    S: np.ndarray, rows: np.ndarray, lam: float, alpha: float, beta: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Outranking of ``rows`` over everyone and of everyone over ``rows``."""
+    s_out = np.asarray(S[rows], dtype=float)
+    s_in = np.asarray(S[:, rows], dtype=float).T
+    out = _outranking(s_out, s_in, lam, alpha, beta)
+    inc = _outranking(s_in, s_out, lam, alpha, beta)
+    diagonal = np.arange(len(rows))
+    out[diagonal, rows] = False
+    inc[diagonal, rows] = False
+    return out, inc
+
+
+def _row_maxima(
+    S: np.ndarray, rows: np.ndarray, active: np.ndarray, ceiling: float = np.inf
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest credibility of every row over active columns not above ``ceiling``."""
+    s = np.asarray(S[rows], dtype=float)
+    s = np.where(active & (s <= ceiling), s, -np.inf)
+    s[np.arange(len(rows)), rows] = -np.inf
+    arg = s.argmax(axis=1)
+    return s[np.arange(len(rows)), arg], arg
+
+
+def _next_level(lam: float, alpha: float, beta: float) -> float:
+    return lam - (alpha + beta * lam)
+
+
+def _refine(
+    S: np.ndarray,
+    chosen: np.ndarray,
+    lam: float,
+    descending: bool,
+    alpha: float,
+    beta: float,
+) -> np.ndarray:
+    """Inner distillation of a set tied at level ``lam``, continuing below it."""
+    while len(chosen) > 1 and lam > 0:
+        sub = np.asarray(S[np.ix_(chosen, chosen)], dtype=float)
+        # the diagonal is masked out of the search and the relation, but kept
+        # finite so the discrimination test never adds -inf to +inf
+        off_diagonal = ~np.eye(len(chosen), dtype=bool)
+        below = sub[off_diagonal & (sub <= _next_level(lam, alpha, beta))]
+        lam = max(below.max(), 0.0) if len(below) else 0.0
+        t = _outranking(sub, sub.T, lam, alpha, beta)
+        np.fill_diagonal(t, False)
+        qualification = t.sum(1) - t.sum(0)
+        best = qualification.max() if descending else qualification.min()
+        chosen = chosen[qualification == best]
+    return chosen
+
+
+def _distill(
+    S: np.ndarray, descending: bool, alpha: float, beta: float, block: int
+) -> np.ndarray:
+    """Level at which every alternative is extracted, 0 being the first.
+
+    Each step takes lambda_0 as the largest credibility among the remaining
+    alternatives and lambda_1 as the largest one not above
+    lambda_0 - s(lambda_0); a outranks b when S(a, b) > lambda_1 and the
+    discrimination test holds. Both maxima are tracked per row, and strength
+    and weakness are only recomputed when lambda_1 changes; otherwise they are
+    updated by subtracting the relations of the extracted alternatives, so the
+    matrix is never sliced into sub-problems. ``S`` is only ever read
+    ``block`` rows (and columns) at a time, so it may be a memmap larger than
+    memory.
+    """
+    n = S.shape[0]
+    everyone = np.arange(n)
+    active = np.ones(n, dtype=bool)
+    levels = np.full(n, -1)
+    row_max = np.empty(n)
+    row_arg = np.empty(n, dtype=int)
+    for rows in _chunks(everyone, block):
+        row_max[rows], row_arg[rows] = _row_maxima(S, rows, active)
+    row_below = np.full(n, -np.inf)
+    below_arg = np.zeros(n, dtype=int)
+    strength = np.zeros(n, dtype=int)
+    weakness = np.zeros(n, dtype=int)
+    current_cut = None
+    current_lam = None
+    level = 0
+    while active.any():
+        members = everyone[active]
+        cut = _next_level(max(row_max[members].max(), 0.0), alpha, beta)
+        if cut != current_cut:
+            for rows in _chunks(members, block):
+                row_below[rows], below_arg[rows] = _row_maxima(S, rows, active, cut)
+            current_cut = cut
+        lam = max(row_below[members].max(), 0.0)
+        if lam != current_lam:
+            strength[:] = 0
+            weakness[:] = 0
+            for rows in _chunks(members, block):
+                out, _ = _relations(S, rows, lam, alpha, beta)
+                t = out[:, members]
+                strength[rows] = t.sum(1)
+                weakness[members] += t.sum(0)
+            current_lam = lam
+        qualification = strength[members] - weakness[members]
+        best = qualification.max() if descending else qualification.min()
+        chosen = members[qualification == best]
+        chosen = _refine(S, chosen, lam, descending, alpha, beta)
+        levels[chosen] = level
+        level += 1
+
+        for rows in _chunks(chosen, block):
+            out, inc = _relations(S, rows, current_lam, alpha, beta)
+            weakness -= out.sum(0)
+            strength -= inc.sum(0)
+        active[chosen] = False
+        row_max[chosen] = -np.inf
+        row_below[chosen] = -np.inf
+        stale = everyone[active & np.isin(row_arg, chosen)]
+        for rows in _chunks(stale, block):
+            row_max[rows], row_arg[rows] = _row_maxima(S, rows, active)
+        stale = everyone[active & np.isin(below_arg, chosen)]
+        for rows in _chunks(stale, block):
+            row_below[rows], below_arg[rows] = _row_maxima(
+                S, rows, active, current_cut
+            )
+    return levels
+
+
+def _stack_max(S: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Largest masked credibility of every matrix in a stack, at least 0."""
+    return np.maximum(np.where(mask, S, -np.inf).max(axis=(1, 2)), 0.0)
+
+
+def _select(outranks: np.ndarray, members: np.ndarray, descending: bool) -> np.ndarray:
+    """Members with the best qualification in every matrix of a stack."""
+    t = outranks & members[:, :, None] & members[:, None, :]
+    qualification = t.sum(2) - t.sum(1)
+    if descending:
+        best = np.where(members, qualification, np.iinfo(int).min).max(1)
+    else:
+        best = np.where(members, qualification, np.iinfo(int).max).min(1)
+    return members & (qualification == best[:, None])
+
+
+def _distill_stack(
+    S: np.ndarray, descending: bool, alpha: float, beta: float
+) -> np.ndarray:
+    """``_distill`` of every matrix in a (w, n, n) stack at once.
+
+    All matrices are at the same extraction level in every iteration, each
+    with its own lambda levels and masks, so the Python loop runs once per
+    level and refinement round instead of once per matrix.
+    """
+    S = np.asarray(S, dtype=float)
+    w, n = S.shape[:2]
+    off_diagonal = ~np.eye(n, dtype=bool)
+    # the discrimination test does not depend on lambda
+    discriminates = (S > S.swapaxes(1, 2) + alpha + beta * S) & off_diagonal
+    active = np.ones((w, n), dtype=bool)
+    levels = np.full((w, n), -1)
+    level = 0
+    while active.any():
+        pairs = active[:, :, None] & active[:, None, :] & off_diagonal
+        cut = _next_level(_stack_max(S, pairs), alpha, beta)
+        lam = _stack_max(S, pairs & (S <= cut[:, None, None]))
+        outranks = discriminates & (S > lam[:, None, None])
+        chosen = _select(outranks, active, descending)
+        while True:
+            refining = (chosen.sum(1) > 1) & (lam > 0)
+            if not refining.any():
+                break
+            pairs = chosen[:, :, None] & chosen[:, None, :] & off_diagonal
+            cut = _next_level(lam, alpha, beta)
+            below = _stack_max(S, pairs & (S <= cut[:, None, None]))
+            lam = np.where(refining, below, lam)
+            outranks = discriminates & (S > lam[:, None, None])
+            refined = _select(outranks, chosen, descending)
+            chosen = np.where(refining[:, None], refined, chosen)
+        levels[chosen] = level
+        active &= ~chosen
+        level += 1
+    return levels
+
+
+def distillation(
+    S: np.ndarray, alpha: float = 0.3, beta: float = -0.15, block: int = 1024
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Descending and ascending distillation ranks, 0 being the best position.
+
+    ``alpha`` and ``beta`` define the discrimination threshold
+    s(lambda) = alpha + beta * lambda. ``S`` may be the memmap returned by
+    ``credibility_tiled``, or a (w, n, n) stack of matrices small enough to
+    fit in memory several times over, which are distilled together and give
+    (w, n) ranks.
+    """
+    if S.ndim == 3:
+        descending = _distill_stack(S, True, alpha, beta)
+        ascending = _distill_stack(S, False, alpha, beta)
+        return descending, ascending.max(axis=1, keepdims=True) - ascending
+    descending = _distill(S, True, alpha, beta, block)
+    ascending = _distill(S, False, alpha, beta, block)
+    return descending, ascending.max() - ascending
+
+
+def preorder_relation(descending: np.ndarray, ascending: np.ndarray) -> np.ndarray:
+    """Relation between every pair in the final pre-order: P, P-, I or R."""
+    d = np.sign(descending[None, :] - descending[:, None])
+    a = np.sign(ascending[None, :] - ascending[:, None])
+    relation = np.full(d.shape, "R", dtype=object)
+    relation[(d >= 0) & (a >= 0)] = "P"
+    relation[(d <= 0) & (a <= 0)] = "P-"
+    relation[(d == 0) & (a == 0)] = "I"
+    return relation
+
+
+def final_ranking(descending: np.ndarray, ascending: np.ndarray) -> np.ndarray:
+    """Position of every alternative in the final pre-order, 0 being the best.
+
+    An alternative is placed right below the lowest-placed alternative that
+    is preferred to it in both distillations; incomparable ones share levels.
+    """
+    pairs, inverse = np.unique(
+        np.stack([descending, ascending], axis=1), axis=0, return_inverse=True
+    )
+    positions = np.zeros(len(pairs), dtype=int)
+    for i in range(1, len(pairs)):
+        better = (pairs[:i, 0] <= pairs[i, 0]) & (pairs[:i, 1] <= pairs[i, 1])
+        if better.any():
+            positions[i] = positions[:i][better].max() + 1
+    return positions[inverse.reshape(-1)]